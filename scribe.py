@@ -7,6 +7,12 @@ import random
 from termcolor import colored, COLORS
 from threading import Thread
 import pickle
+import hashlib
+import re
+import copy
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Sequence
 
 from inspect import getmembers, ismethod
 
@@ -32,6 +38,9 @@ class TerminalScribeException(Exception):
 class InvalidParameter(TerminalScribeException):
     pass
 
+class InvalidScript(TerminalScribeException):
+    pass
+
 class Canvas:
     def __init__(self, width, height, scribes=[], framerate=0.05):
         self._x = width
@@ -42,6 +51,11 @@ class Canvas:
         self.can_print = True
         self.corners = [(0,0),(width-1, 0),(0, height-1),(width-1,height-1)]
         self.corner_walls = [(Wall.TOP,Wall.LEFT), (Wall.TOP, Wall.RIGHT),(Wall.RIGHT,Wall.BOTTOM),(Wall.LEFT, Wall.BOTTOM)]
+        # cells set since the last checkpoint, see write_checkpoint
+        self._dirty = set()
+        self._checkpoint_seq = 0
+        self._deltas = 0
+        self._hist_starts = []
 
     def hits_wall(self, point):
         if (round(point[0]),round(point[1])) in self.corners:
@@ -85,6 +99,7 @@ class Canvas:
             raise ValueError("pos ({0},{1}) out of bounds max ({2},{3})".format(pos[0],pos[1],self._x,self._y))
         try:
             self._canvas[round(pos[0])][round(pos[1])] = mark
+            self._dirty.add((round(pos[0]), round(pos[1])))
         except Exception as e:
             raise TerminalScribeException('Cound not set position to {}} with mark '.format(pos, mark))
 
@@ -94,9 +109,38 @@ class Canvas:
     def clear(self):
         os.system('cls' if os.name == 'nt' else 'clear')
 
-    def go(self):
+    def go(self, checkpoint_dir=None, checkpoint_every=100, compact_every=20, overwrite=False):
+        """
+        Run all scribe moves. With checkpoint_dir set a checkpoint is written
+        every checkpoint_every frames so the run can be continued with resume().
+        Existing checkpoints in checkpoint_dir are only replaced with overwrite.
+        """
+        if checkpoint_dir:
+            self._check_checkpoint_args(checkpoint_every, compact_every)
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            self._remove_stale_tmp(checkpoint_dir)
+            files = self._checkpoint_files(checkpoint_dir)
+            if files and not overwrite:
+                raise TerminalScribeException('{} already has checkpoints, use resume() or overwrite=True'.format(checkpoint_dir))
+            for f in files:
+                os.remove(os.path.join(checkpoint_dir, f))
+            self._checkpoint_seq = 0
+            self.write_checkpoint(checkpoint_dir, 0, compact_every)
+        self._run(0, checkpoint_dir, checkpoint_every, compact_every)
+
+    def resume(self, checkpoint_dir, checkpoint_every=100, compact_every=20):
+        """
+        Continue a run from the checkpoints in checkpoint_dir. The canvas must be
+        set up with the same scribes and moves as the run that wrote them.
+        """
+        self._check_checkpoint_args(checkpoint_every, compact_every)
+        frame = self.load_checkpoint(checkpoint_dir)
+        logging.info('resuming from {} at frame {}'.format(checkpoint_dir, frame))
+        self._run(frame, checkpoint_dir, checkpoint_every, compact_every)
+
+    def _run(self, start_frame, checkpoint_dir, checkpoint_every, compact_every):
         max_moves = max([len(scribe.moves) for scribe in self.scribes])
-        for i in range(max_moves):
+        for i in range(start_frame, max_moves):
             for scribe in self.scribes:
                 try:
                     threads = []
@@ -113,6 +157,111 @@ class Canvas:
             self.print()
             time.sleep(self.framerate)
 
+            if checkpoint_dir and ((i + 1) % checkpoint_every == 0 or i + 1 == max_moves):
+                self.write_checkpoint(checkpoint_dir, i + 1, compact_every)
+
+    def _check_checkpoint_args(self, checkpoint_every, compact_every):
+        if checkpoint_every < 1:
+            raise InvalidParameter('checkpoint_every must be at least 1')
+        if compact_every < 1:
+            raise InvalidParameter('compact_every must be at least 1')
+
+    def _checkpoint_files(self, checkpoint_dir):
+        return sorted(f for f in os.listdir(checkpoint_dir) if f.endswith('.ckpt'))
+
+    def _remove_stale_tmp(self, checkpoint_dir):
+        # left behind when a run was preempted in the middle of write_checkpoint
+        for f in os.listdir(checkpoint_dir):
+            if f.endswith('.ckpt.tmp'):
+                os.remove(os.path.join(checkpoint_dir, f))
+
+    def _fsync_dir(self, checkpoint_dir):
+        # make the rename itself durable, directories can't be opened on windows
+        if os.name == 'nt':
+            return
+        fd = os.open(checkpoint_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def write_checkpoint(self, checkpoint_dir, frame, compact_every=20):
+        """
+        A full checkpoint holds the whole grid, the ones after it only the cells
+        set since the previous checkpoint. Every compact_every incremental
+        checkpoints a new full one is written and the older files removed.
+        Each file is written to a temp file and renamed so a preempted write
+        never leaves a partial checkpoint.
+        """
+        full = self._checkpoint_seq == 0 or self._deltas >= compact_every
+        if full:
+            data = {'x': self._x, 'y': self._y, 'canvas': self._canvas}
+            self._hist_starts = [0 for scribe in self.scribes]
+        else:
+            data = {'cells': {cell: self._canvas[cell[0]][cell[1]] for cell in self._dirty}}
+        data['frame'] = frame
+        data['random'] = random.getstate()
+        data['scribes'] = [scribe.checkpoint_state(start) for scribe, start in zip(self.scribes, self._hist_starts)]
+
+        name = '{:08d}.{}.ckpt'.format(self._checkpoint_seq, 'full' if full else 'delta')
+        path = os.path.join(checkpoint_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self._fsync_dir(checkpoint_dir)
+        logging.debug('wrote checkpoint {} frame: {} cells: {}'.format(path, frame, len(self._dirty)))
+
+        if full:
+            # older checkpoints are only needed until the new full one is on disk
+            for f in self._checkpoint_files(checkpoint_dir):
+                if f < name:
+                    os.remove(os.path.join(checkpoint_dir, f))
+            self._deltas = 0
+        else:
+            self._deltas += 1
+        self._checkpoint_seq += 1
+        self._dirty = set()
+        self._hist_starts = [len(scribe.pos_hist) for scribe in self.scribes]
+
+    def load_checkpoint(self, checkpoint_dir):
+        """
+        Restore the grid, scribe state and random state from checkpoint_dir and
+        return the frame to continue from
+        """
+        self._remove_stale_tmp(checkpoint_dir)
+        files = self._checkpoint_files(checkpoint_dir)
+        fulls = [i for i, f in enumerate(files) if f.endswith('.full.ckpt')]
+        if not fulls:
+            raise TerminalScribeException('No checkpoint found in {}'.format(checkpoint_dir))
+        # replay from the newest full checkpoint, older files may be left over from a crash during compaction
+        files = files[fulls[-1]:]
+
+        frame = 0
+        for name in files:
+            with open(os.path.join(checkpoint_dir, name), 'rb') as f:
+                data = pickle.load(f)
+            if 'canvas' in data:
+                if (data['x'], data['y']) != (self._x, self._y):
+                    raise TerminalScribeException('Checkpoint canvas size ({},{}) does not match ({},{})'.format(data['x'], data['y'], self._x, self._y))
+                self._canvas = data['canvas']
+            else:
+                for cell, mark in data['cells'].items():
+                    self._canvas[cell[0]][cell[1]] = mark
+            if len(data['scribes']) != len(self.scribes):
+                raise TerminalScribeException('Checkpoint has {} scribes, canvas has {}'.format(len(data['scribes']), len(self.scribes)))
+            for scribe, state in zip(self.scribes, data['scribes']):
+                scribe.restore_state(state)
+            random.setstate(data['random'])
+            frame = data['frame']
+
+        self._checkpoint_seq = int(files[-1].split('.')[0]) + 1
+        self._deltas = len(files) - 1
+        self._dirty = set()
+        self._hist_starts = [len(scribe.pos_hist) for scribe in self.scribes]
+        return frame
+
     def print(self):
         if not self.can_print:
             return
@@ -132,6 +281,26 @@ class Canvas:
                 print(e)
                 raise TerminalScribeException("File {} is not a valid Scribe file".format(file_name))
 
+    def from_scene(script):
+        """
+        Build a canvas and its scribes from a scene script (text or JSON, see
+        compile_scene)
+        """
+        canvas_data, scribes_data = compile_scene(script)
+        scribes = []
+        for scribe_class, kwargs, program in scribes_data:
+            try:
+                scribe = scribe_class(**kwargs)
+            except TypeError as e:
+                raise InvalidScript('Invalid {} parameters: {}'.format(scribe_class.__name__, e))
+            scribe.moves = program.bind(scribe)
+            scribes.append(scribe)
+        return canvas_data['classname'](canvas_data['x'], canvas_data['y'], scribes=scribes)
+
+    def from_scene_file(file_name):
+        with open(file_name, 'r') as f:
+            return Canvas.from_scene(f.read())
+
     def to_dict(self):
         return {
             'classname': type(self).__name__,
@@ -221,7 +390,7 @@ class TerminalScribe:
         if self.show_direction_history:
             print("History:",self.direction_history)
 
-    def _set_color(self, color_name):
+    def _set_color(self, color_name, _):
         self.color = color_name
 
     def set_color(self, color_name):
@@ -350,6 +519,24 @@ class TerminalScribe:
             'moves': [[move[0].__name__, move[1]] for move in self.moves]
         }
 
+    def checkpoint_state(self, hist_start=0):
+        # dynamic state only, moves are rebuilt by the caller before resuming
+        return {
+            'color': self.color,
+            'pos': self.pos,
+            'direction': self.direction,
+            'last_direction': self.last_direction,
+            'hist_start': hist_start,
+            'pos_hist': self.pos_hist[hist_start:],
+        }
+
+    def restore_state(self, state):
+        self.color = state['color']
+        self.pos = state['pos']
+        self.direction = state['direction']
+        self.last_direction = state['last_direction']
+        self.pos_hist[state['hist_start']:] = state['pos_hist']
+
     def from_dict(data):
         scribe = globals()[data.get('classname')](
             color=data.get('color'),
@@ -381,6 +568,15 @@ class PlotScribe(TerminalScribe):
         for x in range(self.domain[0], self.domain[1]):
             self.moves.append((self._plot_x, [func]))
 
+    def checkpoint_state(self, hist_start=0):
+        state = super().checkpoint_state(hist_start)
+        state['x'] = self.x
+        return state
+
+    def restore_state(self, state):
+        super().restore_state(state)
+        self.x = state['x']
+
 class FunctionScribe(TerminalScribe):
 
     def draw_function(self, func, move_count=100):
@@ -469,6 +665,19 @@ class WalkScribe(TerminalScribe):
 
         return super().calc_next_pos()
 
+    def checkpoint_state(self, hist_start=0):
+        state = super().checkpoint_state(hist_start)
+        state['step'] = self.step
+        state['color_index'] = self.color_index
+        state['last_color_index'] = self.last_color_index
+        return state
+
+    def restore_state(self, state):
+        super().restore_state(state)
+        self.step = state['step']
+        self.color_index = state['color_index']
+        self.last_color_index = state['last_color_index']
+
 
     def walk(self, distance=1000):
         self.set_direction(random.randrange(360))
@@ -480,53 +689,352 @@ class WalkScribe(TerminalScribe):
 
 
 
-def do_scribes():
+class MoveProgram(Sequence):
+    """
+    Compiled move list for a scene script. Parts are either runs of one move
+    (name, args, count) or nested programs, a program repeats its parts
+    times times. Moves are looked up by index so loops and subroutines are
+    never expanded into a list.
+
+    >>> p = MoveProgram()
+    >>> p.add_move('_set_direction', [0])
+    >>> p.add_move('_set_direction', [90])
+    >>> p.add_move('_forward', [], 5)
+    >>> p.add_move('_forward', [], 3)
+    >>> len(p), p.parts
+    (10, [('_set_direction', [0], 1), ('_set_direction', [90], 1), ('_forward', [], 8)])
+    """
+
+    def __init__(self, times=1):
+        self.parts = []
+        self.offsets = []
+        self.body_len = 0
+        self.times = times
+
+    def add_move(self, name, args, count=1):
+        last = self.parts[-1] if self.parts else None
+        if isinstance(last, tuple) and last[0] == name and last[1] == args:
+            # fold straight-line runs of the same move, every move still takes a frame
+            self.parts[-1] = (name, args, last[2] + count)
+            self.body_len += count
+            return
+        self.offsets.append(self.body_len)
+        self.parts.append((name, args, count))
+        self.body_len += count
 
-    scribes = [{'start':(10,10), 'color': 'blue', 'actions':[
-            ['direction',130],['forward',10],['direction',170], ['forward',5],
-            ['direction',270], ['forward',10]
-            ]},
-            {'start':(0,0), 'color': 'red', 'actions':[
-                    ['direction',130],['forward',10],['direction',170], ['forward',5],
-                    ['direction',270], ['forward',10]
-                    ]},
-            {'start':(20,20), 'color': 'green', 'actions':[
-                    ['direction',135],['forward',15],['direction',270], ['forward',5],
-                    ['direction',270], ['forward',10], ['up', 10], ['right',5]
-                    ]},
-                    ]
-    canvas = Canvas(40, 30)
-
-
-    for scribe in scribes:
-        scribe['scribe'] = RobotScribe(canvas)
-        if 'color' in scribe:
-            scribe['scribe'].set_color(scribe['color'])
-        if 'start' in scribe:
-            scribe['scribe'].pos = scribe['start']
-
-        for actionData in scribe['actions']:
-            action = actionData[0]
-            actionValue = actionData[1]
-            if action == 'direction':
-                scribe['scribe'].set_direction(actionValue)
-            elif action == 'forward':
-                for i in range(actionValue):
-                    scribe['scribe'].forward()
-            elif action == 'up':
-                for i in range(actionValue):
-                    scribe['scribe'].up()
-            elif action == 'down':
-                for i in range(actionValue):
-                    scribe['scribe'].down()
-            elif action == 'left':
-                for i in range(actionValue):
-                    scribe['scribe'].left()
-            elif action == 'right':
-                for i in range(actionValue):
-                    scribe['scribe'].right()
-            else:
-                raise ValueError('unknown action: ' + action[0])
+    def add_program(self, program):
+        if len(program) == 0:
+            return
+        if program.times == 1 and len(program.parts) == 1 and isinstance(program.parts[0], tuple):
+            self.add_move(*program.parts[0])
+        elif len(program.parts) == 1 and isinstance(program.parts[0], tuple) and program.parts[0][0] == '_forward':
+            self.add_move('_forward', [], program.body_len * program.times)
+        else:
+            self.offsets.append(self.body_len)
+            self.parts.append(program)
+            self.body_len += len(program)
+
+    def __len__(self):
+        return self.body_len * self.times
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('move {} out of range'.format(i))
+        program = self
+        while True:
+            i = i % program.body_len
+            index = bisect_right(program.offsets, i) - 1
+            part = program.parts[index]
+            i -= program.offsets[index]
+            if isinstance(part, tuple):
+                return part[0], part[1]
+            program = part
+
+    def bind(self, scribe):
+        return ScribeMoves(self, scribe)
+
+
+class ScribeMoves(Sequence):
+    """
+    MoveProgram bound to a scribe, used as scribe.moves. Builder methods like
+    forward or set_color append their moves after the compiled program, the
+    program itself is shared and never changed. to_dict writes out every move.
+    """
+
+    def __init__(self, program, scribe):
+        self.program = program
+        self.scribe = scribe
+        self.methods = {}
+        self.extra = []
+
+    def __len__(self):
+        return len(self.program) + len(self.extra)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i >= len(self.program):
+            return self.extra[i - len(self.program)]
+        name, args = self.program[i]
+        if name not in self.methods:
+            self.methods[name] = getattr(self.scribe, name)
+        return self.methods[name], args
+
+    def append(self, move):
+        self.extra.append(move)
+
+
+# direction each robot action turns to before moving forward
+SCENE_DIRECTIONS = {'up': 0, 'right': 90, 'down': 180, 'left': 270}
+
+# compiled scenes by script hash, least recently used dropped first
+SCENE_CACHE_SIZE = 1024
+_scene_cache = OrderedDict()
+
+
+def _scene_value(token):
+    if ',' in token:
+        return tuple(_scene_value(t) for t in token.split(','))
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    if is_number(token):
+        return float(token)
+    return token
+
+
+def _parse_scene_block(tokens, i, closing):
+    statements = []
+    words = []
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if token in (';', '\n'):
+            if words:
+                statements.append(words)
+                words = []
+        elif token == '{':
+            body, i = _parse_scene_block(tokens, i, True)
+            statements.append(words + [body])
+            words = []
+        elif token == '}':
+            if not closing:
+                raise InvalidScript('Unexpected }')
+            if words:
+                statements.append(words)
+            return statements, i
+        else:
+            words.append(token)
+    if closing:
+        raise InvalidScript('Missing }')
+    if words:
+        statements.append(words)
+    return statements, i
+
+
+def _scene_actions(statements):
+    actions = []
+    for words in statements:
+        if words[0] == 'repeat' and len(words) == 3 and isinstance(words[2], list):
+            actions.append(['repeat', _scene_value(words[1]), _scene_actions(words[2])])
+        elif any(isinstance(word, list) for word in words):
+            raise InvalidScript('Unexpected block after {}'.format(words[0]))
+        else:
+            actions.append([words[0]] + [_scene_value(word) for word in words[1:]])
+    return actions
+
+
+def parse_scene_text(text):
+    """
+    Parse a text scene script into the JSON scene format
+
+    >>> parse_scene_text('canvas Canvas 10 10\\nscribe color=blue pos=2,2\\nrepeat 4 { right 5; down 5 }')['scribes']
+    [{'classname': 'RobotScribe', 'color': 'blue', 'pos': (2, 2), 'actions': [['repeat', 4, [['right', 5], ['down', 5]]]]}]
+    """
+    lines = [line.split('#')[0] for line in text.splitlines()]
+    tokens = re.findall(r'[{};\n]|[^\s{};]+', '\n'.join(lines))
+    statements, _ = _parse_scene_block(tokens, 0, False)
+
+    scene = {'subroutines': {}, 'scribes': []}
+    for words in statements:
+        if words[0] == 'canvas':
+            if len(words) != 4:
+                raise InvalidScript('canvas needs a classname, width and height')
+            scene['canvas'] = {'classname': words[1], 'x': _scene_value(words[2]), 'y': _scene_value(words[3])}
+        elif words[0] == 'def':
+            if len(words) != 3 or not isinstance(words[2], list):
+                raise InvalidScript('def needs a name and a {} block')
+            scene['subroutines'][words[1]] = _scene_actions(words[2])
+        elif words[0] == 'scribe':
+            scribe = {'classname': 'RobotScribe'}
+            for word in words[1:]:
+                if isinstance(word, list):
+                    raise InvalidScript('Unexpected block after scribe')
+                if '=' in word:
+                    key, value = word.split('=', 1)
+                    scribe[key] = _scene_value(value)
+                else:
+                    scribe['classname'] = word
+            scribe['actions'] = []
+            scene['scribes'].append(scribe)
+        elif scene['scribes']:
+            scene['scribes'][-1]['actions'] += _scene_actions([words])
+        else:
+            raise InvalidScript('{} before the first scribe'.format(words[0]))
+    return scene
+
+
+def _scene_class(classname, base):
+    # only scribe/canvas classes may be named in a script, never any other module global
+    scene_class = globals().get(classname) if isinstance(classname, str) else None
+    if not isinstance(scene_class, type) or not issubclass(scene_class, base):
+        raise InvalidScript('{} is not a {} class'.format(classname, base.__name__))
+    return scene_class
+
+
+def _scene_pos(pos):
+    if not isinstance(pos, (list, tuple)) or len(pos) != 2 or not all(isinstance(v, (int, float)) and math.isfinite(v) for v in pos):
+        raise InvalidScript('position needs x,y: {}'.format(pos))
+    return tuple(pos)
+
+
+def _compile_actions(actions, subroutines, program):
+    if not isinstance(actions, list):
+        raise InvalidScript('actions must be a list: {}'.format(actions))
+    for action in actions:
+        if not isinstance(action, list) or not action or not isinstance(action[0], str):
+            raise InvalidScript('action must be a list starting with its name: {}'.format(action))
+        name = action[0]
+        if name == 'repeat':
+            if len(action) != 3 or not isinstance(action[1], int) or action[1] < 0:
+                raise InvalidScript('repeat needs a count and a list of actions: {}'.format(action))
+            body = MoveProgram(times=action[1])
+            _compile_actions(action[2], subroutines, body)
+            program.add_program(body)
+        elif name == 'call':
+            if len(action) != 2 or action[1] not in subroutines:
+                raise InvalidScript('unknown subroutine: {}'.format(action[1:]))
+            program.add_program(subroutines[action[1]])
+        elif len(action) != 2:
+            raise InvalidScript('{} takes one value: {}'.format(name, action))
+        elif name == 'direction':
+            if not isinstance(action[1], (int, float)) or not math.isfinite(action[1]) or action[1] < 0 or action[1] > 360:
+                raise InvalidScript('direction {} needs to be between 0 to 360'.format(action[1]))
+            program.add_move('_set_direction', [action[1]])
+        elif name == 'forward' or name in SCENE_DIRECTIONS:
+            if not isinstance(action[1], int) or action[1] < 0:
+                raise InvalidScript('{} needs a distance: {}'.format(name, action[1]))
+            if name in SCENE_DIRECTIONS:
+                program.add_move('_set_direction', [SCENE_DIRECTIONS[name]])
+            if action[1]:
+                program.add_move('_forward', [], action[1])
+        elif name == 'color':
+            if action[1] not in COLORS:
+                raise InvalidScript('color {} not a valid color'.format(action[1]))
+            program.add_move('_set_color', [action[1]])
+        elif name == 'position':
+            program.add_move('_set_position', [_scene_pos(action[1])])
+        else:
+            raise InvalidScript('unknown action: {}'.format(name))
+
+
+def compile_scene(script):
+    """
+    Compile a scene script once into move programs. script is scene text, a
+    JSON string or an already loaded dict:
+
+        canvas CanvasAxis 40 30
+        def zig { right 2; down 2 }
+        scribe RobotScribe color=blue pos=10,10
+        direction 130; forward 10
+        repeat 4 { right 5; down 5 }
+        call zig
+
+    Results are cached on the script hash. Returns the canvas dict and a list
+    of (scribe class, kwargs, MoveProgram) per scribe.
+    """
+    if isinstance(script, dict):
+        text = json.dumps(script, sort_keys=True)
+    else:
+        text = script
+    key = hashlib.sha256(text.encode()).hexdigest()
+    if key in _scene_cache:
+        _scene_cache.move_to_end(key)
+    else:
+        _scene_cache[key] = _compile_scene_text(text)
+        if len(_scene_cache) > SCENE_CACHE_SIZE:
+            _scene_cache.popitem(last=False)
+    canvas, scribes = _scene_cache[key]
+    # programs are shared, the dicts are copied so callers can't change the cache
+    return dict(canvas), [(scribe_class, copy.deepcopy(kwargs), program) for scribe_class, kwargs, program in scribes]
+
+
+def _compile_scene_text(text):
+    if text.lstrip().startswith(('{', '[')):
+        try:
+            scene = json.loads(text)
+        except ValueError as e:
+            raise InvalidScript('Invalid JSON scene: {}'.format(e))
+    else:
+        scene = parse_scene_text(text)
+    if not isinstance(scene, dict):
+        raise InvalidScript('Scene must be an object with canvas and scribes')
+
+    canvas = scene.get('canvas')
+    if not isinstance(canvas, dict):
+        raise InvalidScript('Scene needs a canvas with classname, x and y')
+    for size in ('x', 'y'):
+        if not isinstance(canvas.get(size), int) or canvas.get(size) < 1:
+            raise InvalidScript('canvas {} must be a positive whole number: {}'.format(size, canvas.get(size)))
+    canvas = {'classname': _scene_class(canvas.get('classname', 'Canvas'), Canvas), 'x': canvas['x'], 'y': canvas['y']}
+
+    subroutines = {}
+    if not isinstance(scene.get('subroutines', {}), dict):
+        raise InvalidScript('subroutines must map names to actions')
+    for name, actions in scene.get('subroutines', {}).items():
+        # registered after compiling so a subroutine can only call earlier ones
+        program = MoveProgram()
+        _compile_actions(actions, subroutines, program)
+        subroutines[name] = program
+
+    scribes = []
+    if not isinstance(scene.get('scribes', []), list):
+        raise InvalidScript('scribes must be a list')
+    for data in scene.get('scribes', []):
+        if not isinstance(data, dict):
+            raise InvalidScript('scribe must be an object: {}'.format(data))
+        kwargs = {k: v for k, v in data.items() if k not in ('classname', 'actions', 'start')}
+        if 'start' in data:
+            kwargs['pos'] = data['start']
+        if 'pos' in kwargs:
+            kwargs['pos'] = _scene_pos(kwargs['pos'])
+        scribe_class = _scene_class(data.get('classname', 'RobotScribe'), TerminalScribe)
+        program = MoveProgram()
+        _compile_actions(data.get('actions', []), subroutines, program)
+        scribes.append((scribe_class, kwargs, program))
+
+    return canvas, scribes
+
+
+SCENE = """
+canvas Canvas 40 30
+
+scribe color=blue pos=10,10
+direction 130; forward 10; direction 170; forward 5; direction 270; forward 10
+
+scribe color=red pos=0,0
+direction 130; forward 10; direction 170; forward 5; direction 270; forward 10
+
+scribe color=green pos=20,20
+direction 135; forward 15; direction 270; forward 5; direction 270; forward 10
+up 10; right 5
+"""
+
+def do_scribes():
+    return Canvas.from_scene(SCENE)
 
 
 def do_square():
@@ -652,6 +1160,29 @@ def save_load_run_scribes_from_file():
     canvasFromFile.go()
 
 
+def build_checkpoint_scribes():
+    scribe1 = TerminalScribe(color='green')
+    scribe1.set_position((10,10))
+    scribe1.set_direction(135)
+    scribe1.forward(100)
+
+    scribe2 = WalkScribe(color='red')
+    scribe2.set_position((15,15))
+    scribe2.walk(100)
+
+    scribe3 = PlotScribe(domain=(0,31), color='blue')
+    scribe3.plot_x(sine)
+    return [scribe1, scribe2, scribe3]
+
+def checkpoint_resume_run(checkpoint_dir='checkpoints'):
+    # a preempted run started with go(checkpoint_dir) picks up where it left off
+    canvas = CanvasAxis(31, 31, scribes=build_checkpoint_scribes())
+    if os.path.isdir(checkpoint_dir) and canvas._checkpoint_files(checkpoint_dir):
+        canvas.resume(checkpoint_dir, checkpoint_every=10, compact_every=5)
+    else:
+        canvas.go(checkpoint_dir, checkpoint_every=10, compact_every=5)
+
+
 def main():
 
     #do_forward()
@@ -1,4 +1,9 @@
 
+import os
+import random
+
+import pytest
+
 import scribe
 
 def print_get_reflection_degree():
@@ -12,5 +17,196 @@ def print_get_reflection_degree():
             if r != -1:
                 print(i,' =>', r)
 
+class Preempted(Exception):
+    pass
+
+def checkpoint_canvas():
+    canvas = scribe.Canvas(31, 31, scribes=scribe.build_checkpoint_scribes(), framerate=0)
+    canvas.can_print = False
+    return canvas
+
+def canvas_state(canvas):
+    return canvas._canvas, [s.checkpoint_state() for s in canvas.scribes], random.getstate()
+
+def test_resume_is_bit_identical(tmp_path, monkeypatch):
+    monkeypatch.setattr(scribe.time, 'sleep', lambda t: None)
+    random.seed(7)
+    expected = checkpoint_canvas()
+    expected.go()
+    expected = canvas_state(expected)
+
+    frames = [0]
+    def preempt_print():
+        frames[0] += 1
+        if frames[0] in (5, 10, 37, 95, 100):
+            raise Preempted()
+
+    random.seed(7)
+    canvas = checkpoint_canvas()
+    monkeypatch.setattr(canvas, 'print', preempt_print)
+    with pytest.raises(Preempted):
+        canvas.go(tmp_path, checkpoint_every=4, compact_every=3)
+    while True:
+        # a fresh process would start from an unrelated random state
+        random.seed()
+        canvas = checkpoint_canvas()
+        monkeypatch.setattr(canvas, 'print', preempt_print)
+        try:
+            canvas.resume(tmp_path, checkpoint_every=4, compact_every=3)
+            break
+        except Preempted:
+            pass
+
+    assert canvas_state(canvas) == expected
+    # compaction keeps one full checkpoint and fewer than compact_every deltas
+    files = os.listdir(tmp_path)
+    assert len([f for f in files if f.endswith('.full.ckpt')]) == 1
+    assert len(files) <= 4
+
+def test_go_keeps_existing_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(scribe.time, 'sleep', lambda t: None)
+    checkpoint_canvas().go(tmp_path, checkpoint_every=50)
+    files = sorted(os.listdir(tmp_path))
+    with pytest.raises(scribe.TerminalScribeException):
+        checkpoint_canvas().go(tmp_path, checkpoint_every=50)
+    assert sorted(os.listdir(tmp_path)) == files
+    checkpoint_canvas().go(tmp_path, checkpoint_every=50, overwrite=True)
+
+def test_stale_tmp_checkpoints_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(scribe.time, 'sleep', lambda t: None)
+    # a run preempted while writing its first checkpoint can still start
+    (tmp_path / '00000000.full.ckpt.tmp').write_bytes(b'partial')
+    checkpoint_canvas().go(tmp_path, checkpoint_every=50)
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
+
+    (tmp_path / '00000009.delta.ckpt.tmp').write_bytes(b'partial')
+    checkpoint_canvas().resume(tmp_path, checkpoint_every=50)
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
+
+def test_checkpoint_every_must_be_positive(tmp_path):
+    with pytest.raises(scribe.InvalidParameter):
+        checkpoint_canvas().go(tmp_path, checkpoint_every=0)
+    assert os.listdir(tmp_path) == []
+
+NESTED_SCENE = """
+canvas Canvas 20 20
+def zig { right 2; down 1 }
+scribe pos=5,5
+repeat 3 { call zig; repeat 2 { left 1; up 2 }; direction 45; forward 1 }
+forward 3
+repeat 2 { forward 2 }
+call zig
+direction 0; direction 90; direction 90
+up 0
+up 0; forward 3
+"""
+
+def expand_actions(actions, subroutines):
+    # naive per frame expansion to check MoveProgram indexing against
+    for action in actions:
+        if action[0] == 'repeat':
+            for i in range(action[1]):
+                yield from expand_actions(action[2], subroutines)
+        elif action[0] == 'call':
+            yield from expand_actions(subroutines[action[1]], subroutines)
+        elif action[0] == 'direction':
+            yield ('_set_direction', [action[1]])
+        else:
+            if action[0] in scribe.SCENE_DIRECTIONS:
+                yield ('_set_direction', [scribe.SCENE_DIRECTIONS[action[0]]])
+            for i in range(action[1]):
+                yield ('_forward', [])
+
+def test_move_program_matches_expansion():
+    scene = scribe.parse_scene_text(NESTED_SCENE)
+    expected = list(expand_actions(scene['scribes'][0]['actions'], scene['subroutines']))
+    canvas, scribes = scribe.compile_scene(NESTED_SCENE)
+    program = scribes[0][2]
+
+    assert [program[i] for i in range(len(program))] == expected
+    assert program[-1] == expected[-1]
+    with pytest.raises(IndexError):
+        program[len(program)]
+    assert len(program.parts) < len(expected)
+
+    moves = scribe.Canvas.from_scene(NESTED_SCENE).scribes[0].moves
+    assert [(m[0].__name__, m[1]) for m in moves] == expected
+
+def test_move_program_keeps_set_moves():
+    # every set move takes a frame, the same as calling the builder methods
+    robot = scribe.RobotScribe()
+    robot.set_direction(0)
+    robot.set_direction(90)
+    robot.forward(3)
+    robot.up(0)
+    robot.up(0)
+    canvas, scribes = scribe.compile_scene('canvas Canvas 5 5\nscribe\ndirection 0; direction 90; forward 3\nup 0; up 0')
+    program = scribes[0][2]
+    assert [program[i] for i in range(len(program))] == [(m[0].__name__, m[1]) for m in robot.moves]
+
+def test_compile_scene_cache():
+    first = scribe.compile_scene(NESTED_SCENE)
+    second = scribe.compile_scene(NESTED_SCENE)
+    assert first[1][0][2] is second[1][0][2]
+    first[0]['x'] = 99
+    first[1][0][1]['pos'] = (0, 0)
+    third = scribe.compile_scene(NESTED_SCENE)
+    assert third[0]['x'] == 20 and third[1][0][1]['pos'] == (5, 5)
+
+def test_from_scene_go():
+    canvas = scribe.Canvas.from_scene('canvas Canvas 6 6\nscribe color=red pos=1,1\nright 3; down 2')
+    canvas.can_print = False
+    canvas.framerate = 0
+    canvas.go()
+    trail = scribe.colored('.', 'red')
+    mark = scribe.colored('*', 'red')
+    for pos in [(1, 1), (2, 1), (3, 1), (4, 1), (4, 2)]:
+        assert canvas.getPos(pos) == trail
+    assert canvas.getPos((4, 3)) == mark
+    assert sum(cell != ' ' for col in canvas._canvas for cell in col) == 6
+
+def test_scene_scribe_builder_methods():
+    canvas = scribe.Canvas.from_scene('canvas Canvas 8 8\nscribe ShapeScribe color=red pos=1,1\nright 2')
+    canvas.can_print = False
+    canvas.framerate = 0
+    shape = canvas.scribes[0]
+    shape.set_color('blue')
+    shape.draw_square(2)
+    names = [m[0].__name__ for m in shape.moves]
+    assert len(shape.moves) == 3 + 1 + 12
+    assert names[:4] == ['_set_direction', '_forward', '_forward', '_set_color']
+    assert shape.moves[-1][0].__name__ == '_forward'
+
+    canvas.go()
+    # the square ends back where it started
+    assert [round(v) for v in shape.pos] == [3, 1]
+    assert canvas.getPos((3, 1)) == scribe.colored('*', 'blue')
+    for pos in [(4, 1), (5, 1), (5, 2), (5, 3), (4, 3), (3, 3), (3, 2)]:
+        assert canvas.getPos(pos) == scribe.colored('.', 'blue')
+
+    data = canvas.to_dict()['scribes'][0]
+    assert [m[0] for m in data['moves']] == names
+    loaded = scribe.TerminalScribe.from_dict(data)
+    assert [m[0].__name__ for m in loaded.moves] == names
+
+@pytest.mark.parametrize('script', [
+    'canvas Canvas 5 5\nscribe main',
+    'canvas Canvas 5 5\nscribe run_threads',
+    'canvas Thread 5 5\nscribe',
+    'canvas Canvas 5 5\nscribe\nposition 5',
+    'canvas Canvas 5 5\nscribe pos=5',
+    '{"canvas": {"x": 5, "y": 5}, "scribes": [{"actions": [[]]}]}',
+    '[{"start": [10, 10], "actions": [["forward", 1]]}]',
+    '{"canvas": {"classname": "Canvas"}, "scribes": []}',
+    'canvas Canvas 5 5\nscribe foo=1',
+    'canvas Canvas 5 5\nscribe\ndirection nan',
+    'canvas Canvas 5 5\nscribe\ndirection inf',
+    'canvas Canvas 5 5\nscribe\nposition 1,nan',
+    '{"canvas": {"x": 5, "y": 5}, "scribes": [{"actions": [["direction", NaN]]}]}',
+])
+def test_invalid_scene(script):
+    with pytest.raises(scribe.InvalidScript):
+        scribe.Canvas.from_scene(script)
+
 if __name__ == '__main__':
     print_get_reflection_degree()
\ No newline at end of file